@@ -4,7 +4,7 @@ from src.data.dataset_utils import get_OH_data
 
 
 class AssemblyLabelDataset(Dataset):
-    def __init__(self, csv_path, split="correct"):
+    def __init__(self, csv_path, split="correct", cache_dir=None):
         assert split in [
             "correct",
             "mistake",
@@ -15,7 +15,7 @@ class AssemblyLabelDataset(Dataset):
             self.oh_labellist,
             self.metadata,
             self.all_keysteps,
-        ) = get_OH_data(csv_path, split)
+        ) = get_OH_data(csv_path, split, cache_dir=cache_dir)
 
     def __len__(self):
         return len(self.oh_samplelist)
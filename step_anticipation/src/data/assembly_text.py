@@ -46,15 +46,12 @@ class AssemblyTextDataset(Dataset):
         self.data = {}
         for f in self.files:
             df = pd.read_csv(f)
-            self.data[f.stem] = (
-                df[["verb", "this", "that"]]
-                .apply(
-                    # ! Changed " " to "-"
-                    lambda x: "-".join(map(lambda y: y.replace(" ", ""), x)).strip(),
-                    axis=1,
-                )
-                .tolist()
-            )
+            # zip over the column arrays instead of a row-wise apply, no Series per row
+            self.data[f.stem] = [
+                # ! Changed " " to "-"
+                "-".join(map(lambda y: y.replace(" ", ""), x)).strip()
+                for x in zip(df["verb"].to_numpy(), df["this"].to_numpy(), df["that"].to_numpy())
+            ]
 
             # # * Hexadecimal encoding
             # # iterate over the rows of the dataframe i.e. actions, each one is a triple of words
@@ -0,0 +1,41 @@
+import os
+
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from src.data.dataset_utils import get_csv_files
+
+
+def csv2parquet(path_to_csv: str, compression: str = "zstd") -> int:
+    """
+    Converts the csv files in the given path to Parquet, writing <name>.parquet next to each <name>.csv.
+    The loaders in dataset_utils read the Parquet copy instead of the csv file when it is up to date.
+
+    Args:
+        path_to_csv: path to the csv folder
+        compression: Parquet compression codec
+    Returns:
+        n_files: number of converted csv files
+    """
+    csv_files = get_csv_files(path_to_csv, "all")
+    for csv_file in csv_files:
+        csv_path = os.path.join(path_to_csv, csv_file)
+        table = pacsv.read_csv(csv_path)
+        pq.write_table(table, os.path.splitext(csv_path)[0] + ".parquet", compression=compression)
+    return len(csv_files)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Convert the csv files of a folder to Parquet."
+    )
+    parser.add_argument("path_to_csv", type=str, help="Path to the csv folder.")
+    parser.add_argument(
+        "--compression", type=str, default="zstd", help="Parquet compression codec."
+    )
+    args = parser.parse_args()
+
+    n_files = csv2parquet(args.path_to_csv, args.compression)
+    print("Converted {} csv files to Parquet.".format(n_files))
@@ -1,11 +1,39 @@
+import functools
+import hashlib
+import itertools
+import json
 import os
-from typing import Dict, List
+import re
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import torch
-from torch.nn.utils.rnn import pad_sequence
 
 
+# <dataset>_<action>_<view>_<user>-<toy>[_...]_<idx>[.csv], e.g. nusar-2021_action_both_9011-b06b_9011_user_id_2021-02-01_154253.csv
+_NAME_RE = re.compile(r"^(?:[^_.]*_){3}([^_.-]+)-([^_.-]+)_(?:[^.]*_)?([^_.]*)(?:\.|$)")
+
+
+class CsvName(NamedTuple):
+    """
+    Fields of a csv file name.
+    """
+
+    user: str
+    toy: str
+    idx: str
+
+
+@functools.lru_cache(maxsize=None)
 def extract_user_toy_and_id_from_name(name: str):
     """
     Retrieves the user and toy ids from the name of the csv file.
@@ -14,16 +42,15 @@ def extract_user_toy_and_id_from_name(name: str):
     Args:
         name (str): name of the csv file
     Returns:
-        user (str): user id
-        toy (str): toy id
+        name_fields (CsvName): named tuple with
+            user (str): user id
+            toy (str): toy id
+            idx (str): recording id
     """
-    name = name.split(".")[0]
-    name_parts = name.split("_")
-    # Index of the part of the name containing the user and toy ids
-    user_toy_idx = 3  # Subsequent "-" split= 0: user, 1: toy
-    user, toy = name_parts[user_toy_idx].split("-")
-    idx = name_parts[-1]
-    return user, toy, idx
+    match = _NAME_RE.match(name)
+    if match is None:
+        raise ValueError("Unexpected csv file name: {}".format(name))
+    return CsvName(*match.groups())
 
 
 def is_correct_procedure(procedure: pd.DataFrame):
@@ -35,53 +62,369 @@ def is_correct_procedure(procedure: pd.DataFrame):
     Returns:
         is_correct (int): 1 if the procedure is correct, 0 otherwise
     """
-    return int(
-        (len(procedure["label"].unique()) == 1)
-        and (procedure["label"].unique()[0] == "correct")
-    )
+    labels = procedure["label"].to_numpy()
+    return int(len(labels) > 0 and (labels == "correct").all())
+
+
+@functools.lru_cache(maxsize=8)
+def _listdir_csv(path_to_csv: str):
+    """
+    Lists the csv files in the given path with a single directory scan.
+    The result is cached, the folder is scanned only once per process.
+    Names are interned like the ones of the splits.
+
+    Args:
+        path_to_csv: path to the csv folder
+    Returns:
+        filenames: tuple of csv file_names (str) in the given path
+    """
+    with os.scandir(path_to_csv) as entries:
+        return tuple(sys.intern(e.name) for e in entries if e.name.endswith('.csv') and e.is_file())
+
+
+@functools.cache
+def _load_split_arrays():
+    """
+    Loads the csv file_names of the correct and mistake splits from splits.arrow.
+    The file is memory-mapped and the rows of each split are contiguous (correct first, then mistake),
+    so each split is a zero-copy slice of the mapped "filename" column: processes reading it share the
+    same pages, and the file_names stay packed in Arrow string arrays until decoded.
+
+    Returns:
+        split_arrays: dict mapping 'correct' and 'mistake' to the pa.StringArray of the unique csv file_names
+            of the split, in file order
+    """
+    splits = pa.ipc.open_file(pa.memory_map(SPLITS_PATH, "r")).read_all()
+    # the manifest is written as a single record batch, anything else is copied into one array
+    filenames = splits.column("filename")
+    filenames = filenames.chunk(0) if filenames.num_chunks == 1 else filenames.combine_chunks()
+    split_arrays = {}
+    for split in ("correct", "mistake"):
+        rows = np.flatnonzero(pc.equal(splits["split"], split).to_numpy(zero_copy_only=False))
+        start, stop = (int(rows[0]), int(rows[-1]) + 1) if len(rows) else (0, 0)
+        assert stop - start == len(rows), "The rows of the '{}' split must be contiguous in {}.".format(split, SPLITS_PATH)
+        split_filenames = filenames.slice(start, stop - start)
+        if pc.count_distinct(split_filenames).as_py() < len(split_filenames):
+            # deduplicated keeping the first occurrence of each file_name, the only case that copies
+            codes = split_filenames.dictionary_encode().indices.to_numpy()
+            first = np.sort(np.unique(codes, return_index=True)[1])
+            split_filenames = split_filenames.take(pa.array(first))
+        split_arrays[split] = split_filenames
+    return split_arrays
+
+
+def split_filename(split: str, idx: int):
+    """
+    Decodes a single csv file_name of a split, without building the whole list of file_names.
+
+    Args:
+        split: 'correct' or 'mistake'
+        idx: position of the file in the split
+    Returns:
+        filename: csv file_name (str)
+    """
+    return _load_split_arrays()[split][idx].as_py()
+
+
+@functools.cache
+def _load_splits():
+    """
+    Decodes the csv file_names of the correct and mistake splits.
+
+    Returns:
+        splits: dict mapping 'correct' and 'mistake' to the tuple of csv file_names (str) of the split, in file order
+    """
+    # interned, so that comparisons with the names listed from disk short-circuit on identity
+    splits = {
+        split: tuple(map(sys.intern, filenames.to_pylist()))
+        for split, filenames in _load_split_arrays().items()
+    }
+    assert not set(splits["correct"]).intersection(splits["mistake"]), "A csv file can't be in both the correct and the mistake split."
+    return splits
+
+
+@functools.cache
+def _load_split_sets():
+    """
+    Frozensets of the correct and mistake splits, for O(1) membership checks.
+
+    Returns:
+        split_sets: dict mapping 'correct' and 'mistake' to the frozenset of csv file_names (str) of the split
+    """
+    return {split: frozenset(filenames) for split, filenames in _load_splits().items()}
 
 
-def get_csv_files(path_to_csv: str, split: str = 'all'):
+@functools.cache
+def _load_split_index():
+    """
+    Index of the correct and mistake splits by (user, toy), built once with the file name regex.
+
+    Returns:
+        split_index: dict mapping (user, toy) to the tuple of csv file_names (str) recorded for them
+    """
+    split_index = {}
+    for filenames in _load_splits().values():
+        for filename in filenames:
+            user, toy, _ = extract_user_toy_and_id_from_name(filename)
+            split_index[user, toy] = split_index.get((user, toy), ()) + (filename,)
+    return split_index
+
+
+def __getattr__(name: str):
+    # The splits are only read from disk the first time they are accessed
+    if name == "correct_split":
+        return _load_splits()["correct"]
+    if name == "mistake_split":
+        return _load_splits()["mistake"]
+    if name == "CORRECT_SET":
+        return _load_split_sets()["correct"]
+    if name == "MISTAKE_SET":
+        return _load_split_sets()["mistake"]
+    if name == "SPLIT_INDEX":
+        return _load_split_index()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def resolve_splits(path_to_csv: str):
+    """
+    Resolves the csv files in the given path to their size, modification time and split.
+    The mapping is stored as json in .splits.json in the folder and reused by the following runs,
+    as long as it is newer than the split manifest and the folder still holds the same csv files,
+    which is checked with a single directory scan instead of a stat per file.
+    The size and modification time are the ones recorded when the mapping was built, they are stale
+    if a csv file was modified in place since then (delete .splits.json to resolve the files again).
+
+    Args:
+        path_to_csv: path to the csv folder
+    Returns:
+        mapping: dict from csv file_name (str) to (size, mtime_ns, split), split is 'correct', 'mistake' or None
+    """
+    cache_path = os.path.join(path_to_csv, SPLITS_CACHE_NAME)
+    with os.scandir(path_to_csv) as entries:
+        entries = [e for e in entries if e.name.endswith('.csv') and e.is_file()]
+    try:
+        if os.stat(cache_path).st_mtime_ns > os.stat(SPLITS_PATH).st_mtime_ns:
+            with open(cache_path) as f:
+                files = json.load(f)
+            if files.keys() == {e.name for e in entries}:
+                return {sys.intern(name): tuple(value) for name, value in files.items()}
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):  # missing or malformed cache
+        pass
+
+    split_of = {f: split for split, filenames in _load_splits().items() for f in filenames}
+    mapping = {}
+    for e in entries:
+        stat = e.stat()
+        mapping[sys.intern(e.name)] = (stat.st_size, stat.st_mtime_ns, split_of.get(e.name))
+    try:
+        tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+        with open(tmp_path, "w") as f:
+            json.dump(mapping, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:  # read-only dataset folder, resolve again on the next run
+        pass
+    return mapping
+
+
+def shard_files(filenames: List[str], rank: int, world_size: int):
+    """
+    Selects the csv files of a worker, each file is assigned to a shard by a hash of its name.
+    The hash is deterministic (unlike hash()), so every process computes the same shards on its own.
+
+    Args:
+        filenames: list of csv file_names (str)
+        rank: index of the worker
+        world_size: number of workers
+    Returns:
+        shard: list of the csv file_names (str) assigned to the worker, in the input order
+    """
+    assert 0 <= rank < world_size, "The rank must be in [0, world_size)."
+    return [f for f in filenames if zlib.crc32(f.encode()) % world_size == rank]
+
+
+def get_csv_files(path_to_csv: str, split: str = 'all', rank: int = 0, world_size: int = 1):
     """
     Retrieves the csv files in the given path.
 
     Args:
         path_to_csv: path to the csv folder
         split: 'all' for all the csv files, 'correct' for the correct ones, 'mistake' for the mistake ones
+        rank: index of the worker, only its shard of the files is returned (see shard_files)
+        world_size: number of workers sharing the files
     Returns:
         csv_files: list of csv file_names (str) in the given path
     """
     filenames = 'None'
     assert split in ['all', 'correct', 'mistake'], "The split must be 'all', 'correct' or 'mistake'."
     if split == 'all':
-        filenames = [f for f in os.listdir(path_to_csv) if f.endswith('.csv')]
-    elif split == 'correct':
-        filenames = correct_split
-    elif split == 'mistake':
-        filenames = mistake_split
+        filenames = list(_listdir_csv(path_to_csv))
+    else:
+        # copy, the cached tuples are shared by all callers
+        filenames = list(_load_splits()[split])
+        # a single directory scan instead of an existence check per file, done fresh (not through
+        # the listing cached by _listdir_csv) so that files added since the last call are found
+        missing = _load_split_sets()[split].difference(_listdir_csv.__wrapped__(path_to_csv))
+        if missing:
+            raise FileNotFoundError(
+                "{} csv files of the '{}' split are missing in {}, e.g. {}".format(
+                    len(missing), split, path_to_csv, min(missing)
+                )
+            )
+    if world_size > 1:
+        filenames = shard_files(filenames, rank, world_size)
     return filenames
 
 
-def get_csv_data(path_to_csv: str, split: str = 'all', return_filenames: bool = False):
+def _parquet_path(csv_path: str):
+    """
+    Returns the Parquet copy of a csv file written by csv2parquet.py, if it is up to date.
+
+    Args:
+        csv_path: path to the csv file
+    Returns:
+        parquet_path: path to the Parquet file (str), None if missing or older than the csv file
+    """
+    parquet_path = os.path.splitext(csv_path)[0] + ".parquet"
+    try:
+        if os.stat(parquet_path).st_mtime >= os.stat(csv_path).st_mtime:
+            return parquet_path
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def _read_table(path: str):
+    """
+    Reads a single csv file with pyarrow, keeping only the columns used downstream.
+    The Parquet copy of the file is read instead, when there is one.
+
+    Args:
+        path: path to the csv file
+    Returns:
+        table: pyarrow table (pa.Table) with the "verb", "this", "that" and "label" columns
+    """
+    parquet_path = _parquet_path(path)
+    if parquet_path is not None:
+        return pq.read_table(parquet_path, columns=CSV_COLUMNS)
+    return pacsv.read_csv(
+        path,
+        read_options=pacsv.ReadOptions(use_threads=True, block_size=1 << 20),
+        convert_options=pacsv.ConvertOptions(include_columns=CSV_COLUMNS),
+    )
+
+
+def _read_csv(path: str):
+    """
+    Reads a single csv file, see _read_table.
+
+    Args:
+        path: path to the csv file
+    Returns:
+        csv_data: pandas dataframe (pd.DataFrame) with the "verb", "this", "that" and "label" columns
+    """
+    return _read_table(path).to_pandas()
+
+
+def _iter_batches(csv_path: str, batch_size: int = 50_000, dictionary: bool = False):
+    """
+    Yields the rows of a csv file (or of its Parquet copy) as Arrow record batches of the used columns.
+    Only one batch is held in memory at a time.
+
+    Args:
+        csv_path: path to the csv file
+        batch_size: maximum number of rows per batch
+        dictionary: if True, the string columns are dictionary-encoded while reading
+    Returns:
+        batches: generator of pyarrow.RecordBatch with the "verb", "this", "that" and "label" columns
+    """
+    parquet_path = _parquet_path(csv_path)
+    if parquet_path is not None:
+        parquet = pq.ParquetFile(parquet_path, read_dictionary=CSV_COLUMNS if dictionary else None)
+        yield from parquet.iter_batches(batch_size=batch_size, columns=CSV_COLUMNS)
+        return
+    column_types = {c: pa.dictionary(pa.int32(), pa.string()) for c in CSV_COLUMNS} if dictionary else None
+    reader = pacsv.open_csv(
+        csv_path,
+        read_options=pacsv.ReadOptions(block_size=1 << 16),
+        convert_options=pacsv.ConvertOptions(include_columns=CSV_COLUMNS, column_types=column_types),
+    )
+    # the csv reader splits on bytes, slicing is zero-copy
+    for batch in reader:
+        for start in range(0, batch.num_rows, batch_size):
+            yield batch.slice(start, batch_size)
+
+
+def iter_frames(csv_path: str, batch_size: int = 50_000):
+    """
+    Reads a csv file in batches, so that peak memory depends on the batch size and not on the file size.
+
+    Args:
+        csv_path: path to the csv file
+        batch_size: maximum number of rows per dataframe
+    Returns:
+        frames: generator of pandas dataframes (pd.DataFrame) with the "verb", "this", "that" and "label" columns
+    """
+    for batch in _iter_batches(csv_path, batch_size):
+        yield batch.to_pandas()
+
+
+def get_csv_data(path_to_csv: str, split: str = 'all', return_filenames: bool = False, num_workers: int = None):
     """
     Retrieves the csv files in the given path.
+    Files are parsed concurrently, pyarrow releases the GIL while parsing.
 
     Args:
         path_to_csv: path to the csv folder
         split: 'all' for all the csv files, 'correct' for the correct ones, 'mistake' for the mistake ones
+        num_workers: number of threads used to read the csv files (None for one per cpu)
     Returns:
         csv_data: list of pandas dataframes (pd.DataFrame) for the csv file_names in the given path
         csv_files: list of csv file_names (str) in the given path (only if return_filenames=True)
     """
     csv_files = get_csv_files(path_to_csv, split)
-    csv_data = []
-    for csv_file in csv_files:
-        csv_data.append(pd.read_csv(os.path.join(path_to_csv, csv_file)))
+    csv_paths = [os.path.join(path_to_csv, csv_file) for csv_file in csv_files]
+    with ThreadPoolExecutor(max_workers=num_workers or os.cpu_count()) as executor:
+        csv_data = list(executor.map(_read_csv, csv_paths))
     if return_filenames:
         return csv_data, csv_files
     return csv_data
 
 
+def get_csv_table(path_to_csv: str, split: str = 'all'):
+    """
+    Retrieves the csv files in the given path as a single pyarrow table.
+    Files are scanned as pyarrow datasets, which parse them in parallel and only convert the used columns.
+    The Parquet copy of a file is scanned instead, when there is one.
+
+    Args:
+        path_to_csv: path to the csv folder
+        split: 'all' for all the csv files, 'correct' for the correct ones, 'mistake' for the mistake ones
+    Returns:
+        table: pyarrow table (pa.Table) with the "verb", "this", "that" and "label" columns of all the csv files
+            and a dictionary-encoded "file" column with the csv file_name of each row
+    """
+    csv_files = get_csv_files(path_to_csv, split)
+    sources = [_parquet_path(path) or path for path in (os.path.join(path_to_csv, f) for f in csv_files)]
+    position = {source: i for i, source in enumerate(sources)}
+    schema = pa.schema([(c, pa.string()) for c in CSV_COLUMNS])
+    # one dataset per format, the batches are put back in file order afterwards
+    file_batches = [[] for _ in sources]
+    for fmt, ext in (("parquet", ".parquet"), ("csv", ".csv")):
+        paths = [source for source in sources if source.endswith(ext)]
+        if not paths:
+            continue
+        dataset = ds.dataset(paths, schema=schema, format=fmt)
+        for tagged in dataset.scanner(columns=CSV_COLUMNS).scan_batches():
+            file_batches[position[tagged.fragment.path]].append(tagged.record_batch)
+    batches = list(itertools.chain.from_iterable(file_batches))
+    file_idx = np.repeat(
+        np.arange(len(sources), dtype=np.int32),
+        [sum(batch.num_rows for batch in fb) for fb in file_batches],
+    )
+    files = pa.DictionaryArray.from_arrays(file_idx, pa.array(csv_files, type=pa.string()))
+    return pa.Table.from_batches(batches, schema=schema).append_column("file", files)
+
+
 def verb2OH(verb: str):
     """
     Converts a verb to a one-hot vector.
@@ -91,8 +434,8 @@ def verb2OH(verb: str):
     Returns:
         oh: one-hot vector (torch.tensor)
     """
-    oh = torch.zeros(len(verbs_sorted))
-    oh[verbs_sorted.index(verb)] = 1
+    oh = torch.zeros(len(verbs_sorted), dtype=torch.int8)
+    oh[_VERB_IDX[verb]] = 1
     return oh
 
 
@@ -108,12 +451,12 @@ def part2OH(this: str, that: str):
     Returns:
         oh: one-hot vector (torch.tensor)
     """
-    oh = torch.zeros(len(parts_sorted))
+    oh = torch.zeros(len(parts_sorted), dtype=torch.int8)
     if this == that:
-        oh[parts_sorted.index(this)] = 2
+        oh[_PART_IDX[this]] = 2
         return oh
-    oh[parts_sorted.index(this)] = 1
-    oh[parts_sorted.index(that)] = 1
+    oh[_PART_IDX[this]] = 1
+    oh[_PART_IDX[that]] = 1
     return oh
 
 
@@ -126,11 +469,125 @@ def label2OH(label: str):
     Returns:
         oh: one-hot vector (torch.tensor)
     """
-    oh = torch.zeros(len(labels_sorted))
-    oh[labels_sorted.index(label)] = 1
+    oh = torch.zeros(len(labels_sorted), dtype=torch.int8)
+    oh[_LABEL_IDX[label]] = 1
     return oh
 
 
+def _lookup(values: np.ndarray, index: Dict[str, int]):
+    """
+    Maps an array of strings to their positions in the sorted vocabulary.
+
+    Args:
+        values (np.ndarray): strings to be mapped
+        index (dict): vocabulary mapping each string to its position
+    Returns:
+        idx: positions of the strings (np.ndarray of ID_DTYPE)
+    """
+    return np.fromiter((index[v] for v in values), dtype=ID_DTYPE, count=len(values))
+
+
+def _fill_OH(v_idx, this_idx, that_idx, l_idx, n_verbs, n_parts, n_labels):
+    """
+    Scatters the vocabulary positions of a procedure into its one-hot arrays.
+    "this" and "that" are added separately so that equal parts sum up to 2.
+
+    Args:
+        v_idx, this_idx, that_idx, l_idx (np.ndarray): positions of verb, this, that and label for each row
+        n_verbs, n_parts, n_labels (int): sizes of the vocabularies
+    Returns:
+        oh_sample: one-hot array (np.ndarray) of shape (rows, n_verbs + n_parts)
+        oh_label: one-hot array (np.ndarray) of shape (rows, n_labels)
+    """
+    n_rows = len(v_idx)
+    oh_sample = np.zeros((n_rows, n_verbs + n_parts), dtype=OH_DTYPE)
+    oh_label = np.zeros((n_rows, n_labels), dtype=OH_DTYPE)
+    for i in range(n_rows):
+        oh_sample[i, v_idx[i]] = 1
+        oh_sample[i, n_verbs + this_idx[i]] += 1
+        oh_sample[i, n_verbs + that_idx[i]] += 1
+        oh_label[i, l_idx[i]] = 1
+    return oh_sample, oh_label
+
+
+def _fill_OH_torch(v_idx, this_idx, that_idx, l_idx, n_verbs, n_parts, n_labels):
+    """
+    Scatter-based version of _fill_OH, used when numba is not installed.
+    The arrays are allocated once and written in place through torch views.
+    """
+    n_rows = len(v_idx)
+    oh_sample = np.zeros((n_rows, n_verbs + n_parts), dtype=OH_DTYPE)
+    oh_label = np.zeros((n_rows, n_labels), dtype=OH_DTYPE)
+    v_idx, this_idx, that_idx, l_idx = (
+        torch.from_numpy(idx.astype(np.int64)).unsqueeze(1) for idx in (v_idx, this_idx, that_idx, l_idx)
+    )
+    sample = torch.from_numpy(oh_sample)
+    sample.scatter_(1, v_idx, 1)
+    parts = sample[:, n_verbs:]
+    ones = torch.ones_like(this_idx, dtype=sample.dtype)
+    parts.scatter_add_(1, this_idx, ones)
+    parts.scatter_add_(1, that_idx, ones)
+    torch.from_numpy(oh_label).scatter_(1, l_idx, 1)
+    return oh_sample, oh_label
+
+
+@functools.cache
+def _fill_OH_kernel():
+    """
+    Returns _fill_OH compiled with numba, or _fill_OH_torch when numba is not installed.
+    numba is slow to import, so it is only imported the first time a one-hot array is built.
+    """
+    try:
+        from numba import njit
+    except ImportError:  # numba is optional
+        return _fill_OH_torch
+    return njit(cache=True, boundscheck=False)(_fill_OH)
+
+
+def _DF2ids(process_df: pd.DataFrame):
+    """
+    Converts a dataframe to the vocabulary positions of its verbs, parts and labels.
+
+    Args:
+        process_df (pd.DataFrame): dataframe to be converted
+    Returns:
+        ids: tuple of arrays (np.ndarray of ID_DTYPE) with the positions of verb, this, that and label
+    """
+    return (
+        _lookup(process_df["verb"].to_numpy(), _VERB_IDX),
+        _lookup(process_df["this"].to_numpy(), _PART_IDX),
+        _lookup(process_df["that"].to_numpy(), _PART_IDX),
+        _lookup(process_df["label"].to_numpy(), _LABEL_IDX),
+    )
+
+
+def _ids2OH(v_idx, this_idx, that_idx, l_idx):
+    """
+    Converts the vocabulary positions of a procedure to its one-hot representation.
+
+    Args:
+        v_idx, this_idx, that_idx, l_idx (np.ndarray): positions of verb, this, that and label for each row
+    Returns:
+        oh_sample: one-hot vector (torch.tensor)
+        oh_label: one-hot vector (torch.tensor)
+        keysteps: list of keysteps (list of str)
+    """
+    oh_sample, oh_label = _fill_OH_kernel()(
+        v_idx,
+        this_idx,
+        that_idx,
+        l_idx,
+        len(verbs_sorted),
+        len(parts_sorted),
+        len(labels_sorted),
+    )
+    keysteps = [
+        "{}-{}-{}".format(verbs_sorted[v], parts_sorted[t], parts_sorted[th])
+        for v, t, th in zip(v_idx.tolist(), this_idx.tolist(), that_idx.tolist())
+    ]
+    return torch.from_numpy(oh_sample), torch.from_numpy(oh_label), keysteps
+
+
 def DF2OH(process_df: pd.DataFrame):
     """
     Converts a dataframe to a one-hot vector.
@@ -142,63 +599,182 @@ def DF2OH(process_df: pd.DataFrame):
         oh_label: one-hot vector (torch.tensor)
         keysteps: list of keysteps (list of str)
     """
-    all_rows_samples = []
-    all_rows_labels = []
-    keysteps = []
-    for _, row in process_df.iterrows():
-        oh_current_sample = torch.cat(
-            (verb2OH(row["verb"]), part2OH(row["this"], row["that"]))
-        )
-        keysteps.append("{}-{}-{}".format(row["verb"], row["this"], row["that"]))
-        oh_current_label = label2OH(row["label"])
-        all_rows_samples.append(oh_current_sample)
-        all_rows_labels.append(oh_current_label)
-    oh_sample = torch.stack(all_rows_samples)
-    oh_label = torch.stack(all_rows_labels)
-    ### Padding ###
-    assert oh_sample.shape[0] == len(process_df), "The number of rows in the dataframe and the one-hot vector don't match."
-
-    end = 60 - oh_label.shape[0]
-
-    # pad oh_sample & oh_label with all ones on first dimension to match 60 as shape
-    # if oh_sample.shape[0] < 60:
-    #     pad = torch.ones(end, oh_sample.shape[1])
-    #     oh_sample = torch.cat((oh_sample, pad), dim=0)
-    #     pad = torch.ones(end, oh_label.shape[1])
-    #     oh_label = torch.cat((oh_label, pad), dim=0)
-    #     keysteps = keysteps + ["end"] * (end)
-
-    return oh_sample, oh_label, keysteps
-
-
-def get_OH_data(path_to_csv: str, split: str = 'all'):
+    return _ids2OH(*_DF2ids(process_df))
+
+
+def _read_csv_ids(csv_path: str):
+    """
+    Streams a csv file (or its Parquet copy) and converts it to vocabulary positions, without building a dataframe.
+    Arrow dictionary-encodes the string columns while parsing, so only the distinct values
+    of each batch are looked up in the vocabulary, the rows are mapped with a NumPy take.
+
+    Args:
+        csv_path: path to the csv file
+    Returns:
+        ids: tuple of arrays (np.ndarray of ID_DTYPE) with the positions of verb, this, that and label
+    """
+    vocabularies = {"verb": _VERB_IDX, "this": _PART_IDX, "that": _PART_IDX, "label": _LABEL_IDX}
+    chunks = {c: [np.empty(0, dtype=ID_DTYPE)] for c in CSV_COLUMNS}
+    for batch in _iter_batches(csv_path, dictionary=True):
+        for c in CSV_COLUMNS:
+            column = batch.column(c)
+            positions = _lookup(column.dictionary.to_numpy(zero_copy_only=False), vocabularies[c])
+            chunks[c].append(positions[column.indices.to_numpy()])
+    return tuple(np.concatenate(chunks[c]) for c in CSV_COLUMNS)
+
+
+def _csv2ids(csv_path: str):
+    """
+    Reads a csv file and converts it to vocabulary positions.
+
+    Args:
+        csv_path: path to the csv file
+    Returns:
+        ids: tuple of arrays (np.ndarray) with the positions of verb, this, that and label
+        metadata: tuple (user, toy, idx, is_correct) of the csv file
+    """
+    ids = _read_csv_ids(csv_path)
+    # same as is_correct_procedure, on the label positions
+    l_idx = ids[-1]
+    is_correct = int(len(l_idx) > 0 and (l_idx == _LABEL_IDX["correct"]).all())
+    user, toy, idx = extract_user_toy_and_id_from_name(os.path.basename(csv_path))
+    return ids, (user, toy, idx, is_correct)
+
+
+def _OH_cache_key(path_to_csv: str, csv_files: List[str]):
+    """
+    Computes the key of the one-hot cache for the given csv files.
+    The key changes whenever the files (names, sizes and modification times, including their
+    Parquet copies) or the vocabularies used for the one-hot encoding change.
+
+    Args:
+        path_to_csv: path to the csv folder
+        csv_files: list of csv file_names (str) in the given path
+    Returns:
+        key: hex digest (str)
+    """
+    # a single directory scan gets the stats of all the files
+    with os.scandir(path_to_csv) as entries:
+        stats = {e.name: e.stat() for e in entries if e.is_file()}
+    file_items = []
+    for csv_file in sorted(csv_files):
+        file_items.append(csv_file)
+        for name in (csv_file, os.path.splitext(csv_file)[0] + ".parquet"):
+            stat = stats.get(name)
+            if stat is not None:
+                file_items.append("{}:{}:{}".format(name, stat.st_size, stat.st_mtime_ns))
+    h = hashlib.blake2b(digest_size=16)
+    for item in [os.path.abspath(path_to_csv), *file_items, *verbs_sorted, *parts_sorted, *labels_sorted]:
+        h.update(item.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _save_OH_cache(cache_path: str, all_ids: List[tuple], metadata: List[tuple]):
+    """
+    Saves the vocabulary positions of all the csv files in a single Arrow IPC file.
+    Rows of all the files are stored contiguously, file_idx tells which file each row belongs to.
+
+    Args:
+        cache_path: path of the cache file
+        all_ids: list of tuples of arrays (np.ndarray) with the positions of verb, this, that and label
+        metadata: list of tuples (user, toy, idx, is_correct) of the csv files
+    """
+    lengths = [len(ids[0]) for ids in all_ids]
+    columns = {"file_idx": np.repeat(np.arange(len(all_ids), dtype=np.int32), lengths)}
+    for i, name in enumerate(ID_COLUMNS):
+        columns[name] = np.concatenate([ids[i] for ids in all_ids])
+    table = pa.table(columns).replace_schema_metadata({"metadata": json.dumps(metadata)})
+    # write to a temporary file first so that concurrent runs never read a partial cache
+    tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, cache_path)
+
+
+def _load_OH_cache(cache_path: str):
+    """
+    Memory-maps a cache written by _save_OH_cache, the rows are read without copies.
+
+    Args:
+        cache_path: path of the cache file
+    Returns:
+        all_ids: list of tuples of arrays (np.ndarray) with the positions of verb, this, that and label
+        metadata: list of tuples (user, toy, idx, is_correct) of the csv files
+    """
+    table = pa.ipc.open_file(pa.memory_map(cache_path, "r")).read_all()
+    metadata = [tuple(meta) for meta in json.loads(table.schema.metadata[b"metadata"])]
+    file_idx = table.column("file_idx").to_numpy()
+    offsets = np.searchsorted(file_idx, np.arange(len(metadata) + 1))
+    columns = [table.column(name).to_numpy() for name in ID_COLUMNS]
+    all_ids = [
+        tuple(column[start:stop] for column in columns)
+        for start, stop in zip(offsets[:-1], offsets[1:])
+    ]
+    return all_ids, metadata
+
+
+def get_OH_data(
+    path_to_csv: str,
+    split: str = 'all',
+    num_workers: int = 0,
+    cache_dir: str = None,
+    rank: int = 0,
+    world_size: int = 1,
+):
     """
     Retrieves the csv files in the given path and transform it to one-hot representation.
+    Each csv file is parsed independently, optionally in a pool of worker processes.
+    The pool is opt-in: under the spawn start method the calling script must guard its
+    entry point with `if __name__ == "__main__":`.
+    If cache_dir is given, the parsed files are saved there once as an Arrow IPC file
+    and memory-mapped on the following calls.
 
     Args:
         path_to_csv: path to the csv folder
         split: 'all' for all the csv files, 'correct' for the correct ones, 'mistake' for the mistake ones
+        num_workers: number of worker processes (0 to process the files in the main process, None for one per cpu)
+        cache_dir: folder where the parsed csv files are cached (None to disable the cache)
+        rank: index of the worker, only its shard of the files is loaded (see shard_files)
+        world_size: number of workers sharing the files
     Returns:
         oh_samplelist: list of tensor (torch.tensor) from the csv file_names in the given path (verb, this, that)
         oh_labellist: list of tensor (torch.tensor) from the csv file_names in the given path (label)
         metadata: list of tuples (user, toy, is_correct) from the csv file_names in the given path
         all_keysteps: list of lists of keysteps (list of str) from the csv file_names in the given path
     """
-    csv_data, csv_files = get_csv_data(path_to_csv, split, return_filenames=True)
+    csv_files = get_csv_files(path_to_csv, split, rank, world_size)
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, "{}.arrow".format(_OH_cache_key(path_to_csv, csv_files)))
+
+    if cache_path is not None and os.path.exists(cache_path):
+        all_ids, metadata = _load_OH_cache(cache_path)
+    else:
+        csv_paths = [os.path.join(path_to_csv, csv_file) for csv_file in csv_files]
+        if num_workers == 0:
+            results = list(map(_csv2ids, csv_paths))
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                results = list(executor.map(_csv2ids, csv_paths, chunksize=8))
+        all_ids = [ids for ids, _ in results]
+        metadata = [meta for _, meta in results]
+        if cache_path is not None and all_ids:
+            os.makedirs(cache_dir, exist_ok=True)
+            _save_OH_cache(cache_path, all_ids, metadata)
+
     oh_samplelist = []
     oh_labellist = []
     all_keysteps = []
-    metadata = []
-    for csv, csv_name in zip(csv_data, csv_files):
-        oh_sample, oh_label, keysteps = DF2OH(csv)
+    for ids in all_ids:
+        oh_sample, oh_label, keysteps = _ids2OH(*ids)
         oh_samplelist.append(oh_sample)
         oh_labellist.append(oh_label)
         all_keysteps.append(keysteps)
-        user, toy, idx = extract_user_toy_and_id_from_name(csv_name)
-        metadata.append((user, toy, idx, is_correct_procedure(csv)))
     return oh_samplelist, oh_labellist, metadata, all_keysteps
 
-def collate_fn(data):
+
+def collate_fn(data, pad_multiple: int = 8):
     out = {}
 
     oh_samples, oh_labels, metadatas = [], [], []
@@ -207,19 +783,74 @@ def collate_fn(data):
         oh_labels.append(d["oh_label"])
         metadatas.append(d["metadata"])
 
-    # pad according to the max length
+    # pad according to the max length, rounded up to a multiple of pad_multiple to get Tensor Core friendly shapes
     padding_value = 0  # TODO check if 0 or 1 changes something
-    out["oh_sample"] = pad_sequence(
-        oh_samples, batch_first=True, padding_value=padding_value
+    max_len = max(len(s) for s in oh_samples)
+    max_len += -max_len % pad_multiple
+    # write each sample in place into a single preallocated batch
+    out["oh_sample"] = oh_samples[0].new_full(
+        (len(oh_samples), max_len, oh_samples[0].shape[1]), padding_value
     )
-    out["oh_label"] = pad_sequence(
-        oh_labels, batch_first=True, padding_value=padding_value
+    out["oh_label"] = oh_labels[0].new_full(
+        (len(oh_labels), max_len, oh_labels[0].shape[1]), padding_value
     )
+    for i, (oh_sample, oh_label) in enumerate(zip(oh_samples, oh_labels)):
+        out["oh_sample"][i, : len(oh_sample)] = oh_sample
+        out["oh_label"][i, : len(oh_label)] = oh_label
 
     out["metadata"] = metadatas
 
     return out
 
+
+def varlen_collate_fn(data):
+    """
+    Collates the samples without padding, in the layout used by variable-length attention kernels.
+    The samples of the batch are concatenated along the time dimension and cu_seqlens holds
+    the offset of each sample, i.e. sample i is out["oh_sample"][cu_seqlens[i]:cu_seqlens[i + 1]].
+
+    Args:
+        data: list of samples (dict with "oh_sample", "oh_label" and "metadata")
+    Returns:
+        out: dict with the flat "oh_sample" and "oh_label", "cu_seqlens" (int32), "max_seqlen" and "metadata"
+    """
+    out = {}
+
+    oh_samples, oh_labels, metadatas = [], [], []
+    for d in data:
+        oh_samples.append(d["oh_sample"])
+        oh_labels.append(d["oh_label"])
+        metadatas.append(d["metadata"])
+
+    lengths = [len(s) for s in oh_samples]
+    out["oh_sample"] = torch.cat(oh_samples, dim=0)
+    out["oh_label"] = torch.cat(oh_labels, dim=0)
+    out["cu_seqlens"] = torch.tensor([0] + list(itertools.accumulate(lengths)), dtype=torch.int32)
+    out["max_seqlen"] = max(lengths)
+
+    out["metadata"] = metadatas
+
+    return out
+
+# File with the csv file_names of the correct and mistake splits, exposed as
+# correct_split/mistake_split (ordered tuples), CORRECT_SET/MISTAKE_SET (frozensets)
+# and SPLIT_INDEX (dict from (user, toy) to file_names)
+SPLITS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "splits.arrow")
+
+# Name of the file caching the result of resolve_splits in each csv folder
+SPLITS_CACHE_NAME = ".splits.json"
+
+# Columns of the csv files used to build the one-hot representation
+CSV_COLUMNS = ["verb", "this", "that", "label"]
+
+# Columns and type of the vocabulary positions stored in the one-hot cache
+ID_COLUMNS = ["verb_id", "this_id", "that_id", "label_id"]
+ID_DTYPE = np.int16
+
+# Storage type of the one-hot arrays, values are always 0, 1 or 2.
+# Cast to the compute dtype on the device, e.g. oh_sample.to(device, dtype=torch.bfloat16)
+OH_DTYPE = np.int8
+
 verbs_sorted = ["attach", "detach"]
 
 parts_sorted = [
@@ -299,337 +930,6 @@ remarks_sorted = [
     "wrong position",
 ]
 
-correct_split = [
-    'nusar-2021_action_both_9081-a21_9081_user_id_2021-02-12_155024.csv',
-    'nusar-2021_action_both_9021-c03d_9021_user_id_2021-02-23_100036.csv',
-    'nusar-2021_action_both_9025-b08d_9025_user_id_2021-02-18_101512.csv',
-    'nusar-2021_action_both_9046-a29_9046_user_id_2021-02-22_105358.csv',
-    'nusar-2021_action_both_9056-c12d_9056_user_id_2021-02-22_144251.csv',
-    'nusar-2021_action_both_9032-a03_9032_user_id_2021-02-25_155323.csv',
-    'nusar-2021_action_both_9066-a16_9066_user_id_2021-02-17_152811.csv',
-    'nusar-2021_action_both_9086-c03d_9086_user_id_2021-02-16_153418.csv',
-    'nusar-2021_action_both_9011-b08c_9011_user_id_2021-02-01_154736.csv',
-    'nusar-2021_action_both_9074-a29_9074_user_id_2021-02-11_154856.csv',
-    'nusar-2021_action_both_9084-b05c_9084_user_id_2021-02-25_152453.csv',
-    'nusar-2021_action_both_9014-a23_9014_user_id_2021-02-02_142800.csv',
-    'nusar-2021_action_both_9056-a19_9056_user_id_2021-02-22_141312.csv',
-    'nusar-2021_action_both_9033-a30_9033_user_id_2021-02-18_141254.csv',
-    'nusar-2021_action_both_9043-c03c_9043_user_id_2021-02-05_141851.csv',
-    'nusar-2021_action_both_9054-a18_9054_user_id_2021-02-08_153620.csv',
-    'nusar-2021_action_both_9081-a30_9081_user_id_2021-02-12_155525.csv',
-    'nusar-2021_action_both_9014-a12_9014_user_id_2021-02-02_141945.csv',
-    'nusar-2021_action_both_9046-a14_9046_user_id_2021-02-22_104013.csv',
-    'nusar-2021_action_both_9036-a01_9036_user_id_2021-02-17_162038.csv',
-    'nusar-2021_action_both_9052-c03d_9052_user_id_2021-02-25_170244.csv',
-    'nusar-2021_action_both_9052-c14a_9052_user_id_2021-02-25_170706.csv',
-    'nusar-2021_action_both_9025-a20_9025_user_id_2021-02-03_150504.csv',
-    'nusar-2021_action_both_9071-c14a_9071_user_id_2021-02-11_092353.csv',
-    'nusar-2021_action_both_9026-c06e_9026_user_id_2021-02-03_170116.csv',
-    'nusar-2021_action_both_9024-c13b_9024_user_id_2021-02-23_150503.csv',
-    'nusar-2021_action_both_9031-c11b_9031_user_id_2021-02-23_165714.csv',
-    'nusar-2021_action_both_9023-a19_9023_user_id_2021-02-23_133654.csv',
-    'nusar-2021_action_both_9016-b03a_9016_user_id_2021-02-17_140509.csv',
-    'nusar-2021_action_both_9024-c09b_9024_user_id_2021-02-23_152108.csv',
-    'nusar-2021_action_both_9052-b06a_9052_user_id_2021-02-08_110734.csv',
-    'nusar-2021_action_both_9046-b06b_9046_user_id_2021-02-22_105953.csv',
-    'nusar-2021_action_both_9055-b08b_9055_user_id_2021-02-24_104106.csv',
-    'nusar-2021_action_both_9022-a15_9022_user_id_2021-02-03_111237.csv',
-    'nusar-2021_action_both_9032-a21_9032_user_id_2021-02-04_112105.csv',
-    'nusar-2021_action_both_9044-b05b_9044_user_id_2021-02-05_163057.csv',
-    'nusar-2021_action_both_9042-a02_9042_user_id_2021-02-05_111642.csv',
-    'nusar-2021_action_both_9036-c01c_9036_user_id_2021-02-18_092539.csv',
-    'nusar-2021_action_both_9055-b04c_9055_user_id_2021-02-24_103545.csv',
-    'nusar-2021_action_both_9031-c04d_9031_user_id_2021-02-23_163320.csv',
-    'nusar-2021_action_both_9036-c03f_9036_user_id_2021-02-18_093646.csv',
-    'nusar-2021_action_both_9061-b08d_9061_user_id_2021-02-09_141038.csv',
-    'nusar-2021_action_both_9071-b06b_9071_user_id_2021-02-11_100739.csv',
-    'nusar-2021_action_both_9075-a07_9075_user_id_2021-02-12_093237.csv',
-    'nusar-2021_action_both_9062-c08c_9062_user_id_2021-02-09_160823.csv',
-    'nusar-2021_action_both_9065-b06d_9095_user_id_2021-02-17_123817.csv',
-    'nusar-2021_action_both_9064-c09a_9064_user_id_2021-02-22_165525.csv',
-    'nusar-2021_action_both_9025-a20_9025_user_id_2021-02-18_095735.csv',
-    'nusar-2021_action_both_9021-a29_9021_user_id_2021-02-23_094113.csv',
-    'nusar-2021_action_both_9064-a20_9064_user_id_2021-02-22_161628.csv',
-    'nusar-2021_action_both_9014-c13e_9014_user_id_2021-02-02_151834.csv',
-    'nusar-2021_action_both_9014-b02a_9014_user_id_2021-02-02_143628.csv',
-    'nusar-2021_action_both_9086-c14a_9086_user_id_2021-02-16_153910.csv',
-    'nusar-2021_action_both_9022-c01a_9022_user_id_2021-02-23_111001.csv',
-    'nusar-2021_action_both_9051-c08a_9051_user_id_2021-02-22_115717.csv',
-    'nusar-2021_action_both_9042-c03b_9042_user_id_2021-02-05_120824.csv',
-    'nusar-2021_action_both_9044-c03a_9044_user_id_2021-02-19_093447.csv',
-    'nusar-2021_action_both_9065-a24_9095_user_id_2021-02-17_121359.csv',
-    'nusar-2021_action_both_9085-c03d_9085_user_id_2021-02-22_174243.csv',
-    'nusar-2021_action_both_9085-c10a_9085_user_id_2021-02-22_174720.csv',
-    'nusar-2021_action_both_9082-c13f_9082_user_id_2021-02-16_140937.csv',
-    'nusar-2021_action_both_9045-b05d_9045_user_id_2021-02-05_171423.csv',
-    'nusar-2021_action_both_9041-b06d_9041_user_id_2021-02-05_102410.csv',
-    'nusar-2021_action_both_9084-b02b_9084_user_id_2021-02-25_141202.csv',
-    'nusar-2021_action_both_9066-a09_9066_user_id_2021-02-17_152039.csv',
-    'nusar-2021_action_both_9051-b03a_9051_user_id_2021-02-22_114140.csv',
-    'nusar-2021_action_both_9073-a18_9073_user_id_2021-02-11_140513.csv',
-    'nusar-2021_action_both_9074-a03_9074_user_id_2021-02-11_151600.csv',
-    'nusar-2021_action_both_9022-b03b_9022_user_id_2021-02-03_113201.csv',
-    'nusar-2021_action_both_9041-c13f_9041_user_id_2021-02-05_103116.csv',
-    'nusar-2021_action_both_9086-c04c_9086_user_id_2021-02-16_154811.csv',
-    'nusar-2021_action_both_9022-b03b_9022_user_id_2021-02-23_105258.csv',
-    'nusar-2021_action_both_9084-b04c_9084_user_id_2021-02-25_144254.csv',
-    'nusar-2021_action_both_9045-b06c_9045_user_id_2021-02-05_173118.csv',
-    'nusar-2021_action_both_9025-c12a_9025_user_id_2021-02-18_111731.csv',
-    'nusar-2021_action_both_9036-b02a_9036_user_id_2021-02-17_162715.csv',
-    'nusar-2021_action_both_9054-c01a_9054_user_id_2021-02-08_160424.csv',
-    'nusar-2021_action_both_9072-c10a_9072_user_id_2021-02-11_112415.csv',
-    'nusar-2021_action_both_9025-c06b_9025_user_id_2021-02-03_160657.csv',
-    'nusar-2021_action_both_9082-c09b_9082_user_id_2021-02-16_134010.csv',
-    'nusar-2021_action_both_9014-c01b_9014_user_id_2021-02-02_150612.csv',
-    'nusar-2021_action_both_9031-c10b_9031_user_id_2021-02-04_101552.csv',
-    'nusar-2021_action_both_9022-a18_9022_user_id_2021-02-23_104757.csv',
-    'nusar-2021_action_both_9016-c03c_9016_user_id_2021-02-17_142449.csv',
-    'nusar-2021_action_both_9023-c04b_9023_user_id_2021-02-23_144136.csv',
-    'nusar-2021_action_both_9011-c03f_9011_user_id_2021-02-01_160239.csv',
-    'nusar-2021_action_both_9045-b05d_9045_user_id_2021-02-19_103439.csv',
-    'nusar-2021_action_both_9015-a08_9015_user_id_2021-02-02_155549.csv',
-    'nusar-2021_action_both_9081-c08a_9081_user_id_2021-02-12_160626.csv',
-    'nusar-2021_action_both_9033-b04d_9033_user_id_2021-02-04_135802.csv',
-    'nusar-2021_action_both_9012-c07c_9012_user_id_2021-02-01_164345.csv',
-    'nusar-2021_action_both_9053-c08b_9053_user_id_2021-02-08_140757.csv',
-    'nusar-2021_action_both_9031-b01b_9031_user_id_2021-02-23_164014.csv',
-    'nusar-2021_action_both_9026-a07_9026_user_id_2021-02-03_162446.csv',
-    'nusar-2021_action_both_9012-b06d_9012_user_id_2021-02-01_163713.csv',
-    'nusar-2021_action_both_9022-a15_9022_user_id_2021-02-23_104138.csv',
-    'nusar-2021_action_both_9073-b08a_9073_user_id_2021-02-11_145217.csv',
-    'nusar-2021_action_both_9025-a26_9025_user_id_2021-02-03_152505.csv',
-    'nusar-2021_action_both_9033-c06a_9033_user_id_2021-02-18_144743.csv',
-    'nusar-2021_action_both_9046-c01d_9046_user_id_2021-02-22_110733.csv',
-    'nusar-2021_action_both_9083-a19_9083_user_id_2021-02-16_111909.csv',
-    'nusar-2021_action_both_9022-b06c_9022_user_id_2021-02-03_114112.csv',
-    'nusar-2021_action_both_9035-c09a_9035_user_id_2021-02-18_163930.csv',
-    'nusar-2021_action_both_9035-c02c_9035_user_id_2021-02-04_170431.csv',
-    'nusar-2021_action_both_9023-a19_9023_user_id_2021-02-03_132936.csv',
-    'nusar-2021_action_both_9025-c05a_9025_user_id_2021-02-03_155604.csv',
-    'nusar-2021_action_both_9062-c06b_9062_user_id_2021-02-09_154158.csv',
-    'nusar-2021_action_both_9022-c03e_9022_user_id_2021-02-23_111647.csv',
-    'nusar-2021_action_both_9011-b06b_9011_user_id_2021-02-01_154253.csv',
-    'nusar-2021_action_both_9025-c06b_9025_user_id_2021-02-18_105233.csv',
-    'nusar-2021_action_both_9021-a14_9021_user_id_2021-02-23_092806.csv',
-    'nusar-2021_action_both_9042-b05c_9042_user_id_2021-02-05_115957.csv',
-    'nusar-2021_action_both_9072-a15_9072_user_id_2021-02-11_110655.csv',
-    'nusar-2021_action_both_9026-b08a_9026_user_id_2021-02-03_165029.csv',
-    'nusar-2021_action_both_9062-b02b_9062_user_id_2021-02-09_152026.csv',
-    'nusar-2021_action_both_9062-a21_9062_user_id_2021-02-09_151231.csv',
-    'nusar-2021_action_both_9025-a26_9025_user_id_2021-02-18_101010.csv',
-    'nusar-2021_action_both_9085-c01d_9085_user_id_2021-02-22_172144.csv',
-    'nusar-2021_action_both_9035-c08c_9035_user_id_2021-02-18_163203.csv',
-    'nusar-2021_action_both_9056-b08a_9056_user_id_2021-02-09_114053.csv',
-    'nusar-2021_action_both_9022-b06c_9022_user_id_2021-02-23_112257.csv',
-    'nusar-2021_action_both_9034-c13f_9034_user_id_2021-02-23_180813.csv',
-    'nusar-2021_action_both_9043-a12_9043_user_id_2021-02-05_130910.csv',
-    'nusar-2021_action_both_9023-c09c_9023_user_id_2021-02-23_134459.csv',
-    'nusar-2021_action_both_9066-b06a_9066_user_id_2021-02-17_155256.csv',
-    'nusar-2021_action_both_9043-b03b_9043_user_id_2021-02-05_133926.csv',
-    'nusar-2021_action_both_9081-c11b_9081_user_id_2021-02-12_161433.csv',
-    'nusar-2021_action_both_9026-c13c_9026_user_id_2021-02-03_172406.csv',
-    'nusar-2021_action_both_9071-b05d_9071_user_id_2021-02-11_094129.csv',
-    'nusar-2021_action_both_9016-b06a_9016_user_id_2021-02-17_141229.csv',
-    'nusar-2021_action_both_9022-a18_9022_user_id_2021-02-03_112259.csv',
-    'nusar-2021_action_both_9034-c02b_9034_user_id_2021-02-23_173828.csv',
-    'nusar-2021_action_both_9061-c09b_9061_user_id_2021-02-09_143132.csv',
-    'nusar-2021_action_both_9065-a28_9095_user_id_2021-02-17_122244.csv',
-    'nusar-2021_action_both_9021-a29_9021_user_id_2021-02-03_105247.csv',
-    'nusar-2021_action_both_9083-a26_9083_user_id_2021-02-16_112714.csv',
-    'nusar-2021_action_both_9013-c03b_9013_user_id_2021-02-24_113410.csv',
-    'nusar-2021_action_both_9021-c10a_9021_user_id_2021-02-23_100458.csv'
-]
-
-mistake_split = [
-    'nusar-2021_action_both_9044-a08_9044_user_id_2021-02-05_154403.csv',
-    'nusar-2021_action_both_9025-b08d_9025_user_id_2021-02-03_153246.csv',
-    'nusar-2021_action_both_9053-c12e_9053_user_id_2021-02-08_142744.csv',
-    'nusar-2021_action_both_9054-a14_9054_user_id_2021-02-08_152449.csv',
-    'nusar-2021_action_both_9016-a24_9016_user_id_2021-02-17_135905.csv',
-    'nusar-2021_action_both_9063-c02b_9063_user_id_2021-02-17_094025.csv',
-    'nusar-2021_action_both_9045-a23_9045_user_id_2021-02-05_165228.csv',
-    'nusar-2021_action_both_9076-c13d_9076_user_id_2021-02-12_115510.csv',
-    'nusar-2021_action_both_9052-c12c_9052_user_id_2021-02-08_114847.csv',
-    'nusar-2021_action_both_9076-a20_9076_user_id_2021-02-12_110652.csv',
-    'nusar-2021_action_both_9033-a30_9033_user_id_2021-02-04_132852.csv',
-    'nusar-2021_action_both_9085-c01c_9085_user_id_2021-02-22_175419.csv',
-    'nusar-2021_action_both_9071-c03e_9071_user_id_2021-02-11_101746.csv',
-    'nusar-2021_action_both_9055-a07_9055_user_id_2021-02-24_102820.csv',
-    'nusar-2021_action_both_9052-c04c_9052_user_id_2021-02-08_112641.csv',
-    'nusar-2021_action_both_9032-b04a_9032_user_id_2021-02-04_113248.csv',
-    'nusar-2021_action_both_9052-c13d_9052_user_id_2021-02-08_111738.csv',
-    'nusar-2021_action_both_9026-b04b_9026_user_id_2021-02-03_163855.csv',
-    'nusar-2021_action_both_9024-c09b_9024_user_id_2021-02-03_143716.csv',
-    'nusar-2021_action_both_9072-c12d_9072_user_id_2021-02-11_114038.csv',
-    'nusar-2021_action_both_9073-c12a_9073_user_id_2021-02-11_141222.csv',
-    'nusar-2021_action_both_9025-c05a_9025_user_id_2021-02-18_102043.csv',
-    'nusar-2021_action_both_9076-c08c_9076_user_id_2021-02-12_111652.csv',
-    'nusar-2021_action_both_9034-a31_9034_user_id_2021-02-23_171931.csv',
-    'nusar-2021_action_both_9044-b05b_9044_user_id_2021-02-19_091348.csv',
-    'nusar-2021_action_both_9015-c03a_9015_user_id_2021-02-02_163503.csv',
-    'nusar-2021_action_both_9041-a16_9041_user_id_2021-02-05_095801.csv',
-    'nusar-2021_action_both_9021-a14_9021_user_id_2021-02-03_100733.csv',
-    'nusar-2021_action_both_9073-c04a_9073_user_id_2021-02-11_142611.csv',
-    'nusar-2021_action_both_9054-c05a_9054_user_id_2021-02-08_160931.csv',
-    'nusar-2021_action_both_9063-a31_9063_user_id_2021-02-17_091930.csv',
-    'nusar-2021_action_both_9055-c12b_9055_user_id_2021-02-24_111107.csv',
-    'nusar-2021_action_both_9066-b05b_9066_user_id_2021-02-17_154153.csv',
-    'nusar-2021_action_both_9061-c13d_9061_user_id_2021-02-09_143830.csv',
-    'nusar-2021_action_both_9024-c11a_9024_user_id_2021-02-03_144917.csv',
-    'nusar-2021_action_both_9021-a27_9021_user_id_2021-02-03_103039.csv',
-    'nusar-2021_action_both_9045-b06c_9045_user_id_2021-02-19_121606.csv',
-    'nusar-2021_action_both_9023-c04b_9023_user_id_2021-02-03_135504.csv',
-    'nusar-2021_action_both_9013-c09c_9013_user_id_2021-02-24_113951.csv',
-    'nusar-2021_action_both_9045-c03e_9045_user_id_2021-02-19_122426.csv',
-    'nusar-2021_action_both_9012-c14b_9012_user_id_2021-02-01_164944.csv',
-    'nusar-2021_action_both_9016-c01d_9016_user_id_2021-02-17_141821.csv',
-    'nusar-2021_action_both_9065-b05a_9095_user_id_2021-02-17_122813.csv',
-    'nusar-2021_action_both_9064-c02c_9064_user_id_2021-02-22_163357.csv',
-    'nusar-2021_action_both_9046-c10b_9046_user_id_2021-02-22_111419.csv',
-    'nusar-2021_action_both_9061-c02a_9061_user_id_2021-02-09_141537.csv',
-    'nusar-2021_action_both_9035-a06_9035_user_id_2021-02-18_152536.csv',
-    'nusar-2021_action_both_9055-b08b_9055_user_id_2021-02-09_100238.csv',
-    'nusar-2021_action_both_9035-c07b_9035_user_id_2021-02-18_154148.csv',
-    'nusar-2021_action_both_9021-a27_9021_user_id_2021-02-23_093522.csv',
-    'nusar-2021_action_both_9043-b05a_9043_user_id_2021-02-05_134455.csv',
-    'nusar-2021_action_both_9035-c08c_9035_user_id_2021-02-04_172543.csv',
-    'nusar-2021_action_both_9011-c01c_9011_user_id_2021-02-01_155620.csv',
-    'nusar-2021_action_both_9083-c08c_9083_user_id_2021-02-16_110837.csv',
-    'nusar-2021_action_both_9035-a06_9035_user_id_2021-02-04_163525.csv',
-    'nusar-2021_action_both_9023-b05d_9023_user_id_2021-02-03_134815.csv',
-    'nusar-2021_action_both_9044-a08_9044_user_id_2021-02-19_083738.csv',
-    'nusar-2021_action_both_9076-a13_9076_user_id_2021-02-12_104816.csv',
-    'nusar-2021_action_both_9041-c14b_9041_user_id_2021-02-05_104936.csv',
-    'nusar-2021_action_both_9033-c12e_9033_user_id_2021-02-18_150129.csv',
-    'nusar-2021_action_both_9075-a06_9075_user_id_2021-02-12_092222.csv',
-    'nusar-2021_action_both_9084-c02a_9084_user_id_2021-02-25_140008.csv',
-    'nusar-2021_action_both_9076-c12c_9076_user_id_2021-02-12_113921.csv',
-    'nusar-2021_action_both_9065-a17_9095_user_id_2021-02-17_114124.csv',
-    'nusar-2021_action_both_9086-c09b_9086_user_id_2021-02-16_155556.csv',
-    'nusar-2021_action_both_9056-b08a_9056_user_id_2021-02-22_141934.csv',
-    'nusar-2021_action_both_9082-c07b_9082_user_id_2021-02-16_133255.csv',
-    'nusar-2021_action_both_9013-a02_9013_user_id_2021-02-02_130807.csv',
-    'nusar-2021_action_both_9032-c06f_9032_user_id_2021-02-04_114322.csv',
-    'nusar-2021_action_both_9031-c06c_9031_user_id_2021-02-23_164844.csv',
-    'nusar-2021_action_both_9073-a10_9073_user_id_2021-02-25_150711.csv',
-    'nusar-2021_action_both_9034-b04c_9034_user_id_2021-02-04_155013.csv',
-    'nusar-2021_action_both_9036-b08c_9036_user_id_2021-02-17_163111.csv',
-    'nusar-2021_action_both_9055-c06e_9055_user_id_2021-02-09_100939.csv',
-    'nusar-2021_action_both_9071-c13a_9071_user_id_2021-02-11_090900.csv',
-    'nusar-2021_action_both_9014-b05a_9014_user_id_2021-02-02_144248.csv',
-    'nusar-2021_action_both_9021-b05c_9021_user_id_2021-02-23_094649.csv',
-    'nusar-2021_action_both_9082-a10_9082_user_id_2021-02-16_134840.csv',
-    'nusar-2021_action_both_9044-a09_9044_user_id_2021-02-05_155544.csv',
-    'nusar-2021_action_both_9064-a30_9064_user_id_2021-02-22_162122.csv',
-    'nusar-2021_action_both_9075-c08b_9075_user_id_2021-02-12_101609.csv',
-    'nusar-2021_action_both_9015-a09_9015_user_id_2021-02-02_160807.csv',
-    'nusar-2021_action_both_9034-c08b_9034_user_id_2021-02-23_175357.csv',
-    'nusar-2021_action_both_9084-c09b_9084_user_id_2021-02-25_140624.csv',
-    'nusar-2021_action_both_9024-c04c_9024_user_id_2021-02-23_151613.csv',
-    'nusar-2021_action_both_9061-b04a_9061_user_id_2021-02-09_135722.csv',
-    'nusar-2021_action_both_9033-c02a_9033_user_id_2021-02-18_143949.csv',
-    'nusar-2021_action_both_9085-b05c_9085_user_id_2021-02-22_173439.csv',
-    'nusar-2021_action_both_9055-c04b_9055_user_id_2021-02-09_102558.csv',
-    'nusar-2021_action_both_9024-b08b_9024_user_id_2021-02-23_150955.csv',
-    'nusar-2021_action_both_9054-c11a_9054_user_id_2021-02-08_162610.csv',
-    'nusar-2021_action_both_9012-c06d_9012_user_id_2021-02-18_121034.csv',
-    'nusar-2021_action_both_9042-a28_9042_user_id_2021-02-05_113759.csv',
-    'nusar-2021_action_both_9031-c11b_9031_user_id_2021-02-04_104944.csv',
-    'nusar-2021_action_both_9043-c01b_9043_user_id_2021-02-05_140432.csv',
-    'nusar-2021_action_both_9054-c01a_9054_user_id_2021-02-08_154802.csv',
-    'nusar-2021_action_both_9016-c10b_9016_user_id_2021-02-17_143201.csv',
-    'nusar-2021_action_both_9041-a17_9041_user_id_2021-02-05_101033.csv',
-    'nusar-2021_action_both_9066-a08_9066_user_id_2021-02-17_151541.csv',
-    'nusar-2021_action_both_9081-b04d_9081_user_id_2021-02-12_160020.csv',
-    'nusar-2021_action_both_9056-c10b_9056_user_id_2021-02-09_105117.csv',
-    'nusar-2021_action_both_9024-c12c_9024_user_id_2021-02-23_153804.csv',
-    'nusar-2021_action_both_9083-b06a_9083_user_id_2021-02-16_113603.csv',
-    'nusar-2021_action_both_9044-b01a_9044_user_id_2021-02-19_085343.csv',
-    'nusar-2021_action_both_9033-b04d_9033_user_id_2021-02-18_141950.csv',
-    'nusar-2021_action_both_9031-c12d_9031_user_id_2021-02-04_105807.csv',
-    'nusar-2021_action_both_9031-c04d_9031_user_id_2021-02-04_104130.csv',
-    'nusar-2021_action_both_9045-c13e_9045_user_id_2021-02-19_134158.csv',
-    'nusar-2021_action_both_9053-c10b_9053_user_id_2021-02-08_143830.csv',
-    'nusar-2021_action_both_9034-c08b_9034_user_id_2021-02-04_161726.csv',
-    'nusar-2021_action_both_9075-c10c_9075_user_id_2021-02-12_100519.csv',
-    'nusar-2021_action_both_9024-c11a_9024_user_id_2021-02-23_153251.csv',
-    'nusar-2021_action_both_9032-c07a_9032_user_id_2021-02-04_115644.csv',
-    'nusar-2021_action_both_9031-a13_9031_user_id_2021-02-23_160001.csv',
-    'nusar-2021_action_both_9062-b04d_9062_user_id_2021-02-09_152854.csv',
-    'nusar-2021_action_both_9051-c13a_9051_user_id_2021-02-22_121941.csv',
-    'nusar-2021_action_both_9011-c13b_9011_user_id_2021-02-01_160915.csv',
-    'nusar-2021_action_both_9073-b06c_9073_user_id_2021-02-11_135342.csv',
-    'nusar-2021_action_both_9065-c09c_9095_user_id_2021-02-17_124439.csv',
-    'nusar-2021_action_both_9055-c04b_9055_user_id_2021-02-24_110239.csv',
-    'nusar-2021_action_both_9023-a03_9023_user_id_2021-02-23_133018.csv',
-    'nusar-2021_action_both_9051-c10a_9051_user_id_2021-02-22_120421.csv',
-    'nusar-2021_action_both_9056-c13a_9056_user_id_2021-02-22_145733.csv',
-    'nusar-2021_action_both_9056-c09a_9056_user_id_2021-02-22_140419.csv',
-    'nusar-2021_action_both_9026-c12b_9026_user_id_2021-02-03_171236.csv',
-    'nusar-2021_action_both_9074-a14_9074_user_id_2021-02-11_152306.csv',
-    'nusar-2021_action_both_9033-c02a_9033_user_id_2021-02-04_140532.csv',
-    'nusar-2021_action_both_9034-a31_9034_user_id_2021-02-04_152413.csv',
-    'nusar-2021_action_both_9086-c13a_9086_user_id_2021-02-16_152408.csv',
-    'nusar-2021_action_both_9074-c06b_9074_user_id_2021-02-11_160509.csv',
-    'nusar-2021_action_both_9015-b05b_9015_user_id_2021-02-02_161800.csv',
-    'nusar-2021_action_both_9056-c01c_9056_user_id_2021-02-22_143138.csv',
-    'nusar-2021_action_both_9035-c02c_9035_user_id_2021-02-18_153533.csv',
-    'nusar-2021_action_both_9024-c04c_9024_user_id_2021-02-03_142724.csv',
-    'nusar-2021_action_both_9064-c08a_9064_user_id_2021-02-22_164245.csv',
-    'nusar-2021_action_both_9012-a17_9012_user_id_2021-02-01_162209.csv',
-    'nusar-2021_action_both_9013-b01a_9013_user_id_2021-02-02_135446.csv',
-    'nusar-2021_action_both_9055-c06e_9055_user_id_2021-02-24_105542.csv',
-    'nusar-2021_action_both_9023-c05b_9023_user_id_2021-02-23_144552.csv',
-    'nusar-2021_action_both_9056-a19_9056_user_id_2021-02-09_112504.csv',
-    'nusar-2021_action_both_9075-b01b_9075_user_id_2021-02-12_102823.csv',
-    'nusar-2021_action_both_9064-c13a_9064_user_id_2021-02-22_170304.csv',
-    'nusar-2021_action_both_9082-c08c_9082_user_id_2021-02-16_094651.csv',
-    'nusar-2021_action_both_9033-c13a_9033_user_id_2021-02-18_151004.csv',
-    'nusar-2021_action_both_9044-a09_9044_user_id_2021-02-19_084540.csv',
-    'nusar-2021_action_both_9012-a16_9012_user_id_2021-02-01_162904.csv',
-    'nusar-2021_action_both_9031-c12d_9031_user_id_2021-02-23_170320.csv',
-    'nusar-2021_action_both_9041-c07c_9041_user_id_2021-02-05_104114.csv',
-    'nusar-2021_action_both_9032-c08a_9032_user_id_2021-02-25_154353.csv',
-    'nusar-2021_action_both_9054-c06a_9054_user_id_2021-02-08_150948.csv',
-    'nusar-2021_action_both_9072-c04d_9072_user_id_2021-02-11_113148.csv',
-    'nusar-2021_action_both_9042-a11_9042_user_id_2021-02-05_112612.csv',
-    'nusar-2021_action_both_9024-b08b_9024_user_id_2021-02-03_141607.csv',
-    'nusar-2021_action_both_9072-a14_9071_user_id_2021-02-11_104901.csv',
-    'nusar-2021_action_both_9034-b02b_9034_user_id_2021-02-23_172457.csv',
-    'nusar-2021_action_both_9043-a24_9043_user_id_2021-02-05_133010.csv',
-    'nusar-2021_action_both_9063-c14a_9063_user_id_2021-02-17_101116.csv',
-    'nusar-2021_action_both_9061-a01_9061_user_id_2021-02-09_134524.csv',
-    'nusar-2021_action_both_9036-c13b_9036_user_id_2021-02-18_094212.csv',
-    'nusar-2021_action_both_9062-c07a_9062_user_id_2021-02-09_155212.csv',
-    'nusar-2021_action_both_9083-c03a_9083_user_id_2021-02-16_114344.csv',
-    'nusar-2021_action_both_9044-b01a_9044_user_id_2021-02-05_160818.csv',
-    'nusar-2021_action_both_9074-c12e_9074_user_id_2021-02-11_155839.csv',
-    'nusar-2021_action_both_9034-b02b_9034_user_id_2021-02-04_153734.csv',
-    'nusar-2021_action_both_9044-b06a_9044_user_id_2021-02-19_092710.csv',
-    'nusar-2021_action_both_9046-a27_9046_user_id_2021-02-22_104709.csv',
-    'nusar-2021_action_both_9035-c14a_9035_user_id_2021-02-18_164650.csv',
-    'nusar-2021_action_both_9023-c09c_9023_user_id_2021-02-03_133550.csv',
-    'nusar-2021_action_both_9076-c06a_9076_user_id_2021-02-12_112908.csv',
-    'nusar-2021_action_both_9013-a28_9013_user_id_2021-02-02_134923.csv',
-    'nusar-2021_action_both_9081-c13a_9081_user_id_2021-02-12_162453.csv',
-    'nusar-2021_action_both_9053-c03e_9053_user_id_2021-02-08_135619.csv',
-    'nusar-2021_action_both_9066-b03b_9066_user_id_2021-02-17_153607.csv',
-    'nusar-2021_action_both_9071-c12c_9071_user_id_2021-02-11_102615.csv',
-    'nusar-2021_action_both_9051-c12a_9051_user_id_2021-02-22_121059.csv',
-    'nusar-2021_action_both_9015-c04a_9015_user_id_2021-02-02_164257.csv',
-    'nusar-2021_action_both_9034-b04c_9034_user_id_2021-02-23_173159.csv',
-    'nusar-2021_action_both_9031-b01b_9031_user_id_2021-02-04_102950.csv',
-    'nusar-2021_action_both_9053-c09a_9053_user_id_2021-02-08_134120.csv',
-    'nusar-2021_action_both_9045-a23_9045_user_id_2021-02-19_102455.csv',
-    'nusar-2021_action_both_9015-c10c_9015_user_id_2021-02-02_165955.csv',
-    'nusar-2021_action_both_9063-b01b_9063_user_id_2021-02-17_092512.csv',
-    'nusar-2021_action_both_9023-a03_9023_user_id_2021-02-03_131031.csv',
-    'nusar-2021_action_both_9063-c13f_9063_user_id_2021-02-17_100446.csv',
-    'nusar-2021_action_both_9072-b03a_9072_user_id_2021-02-11_111335.csv',
-    'nusar-2021_action_both_9035-c07b_9035_user_id_2021-02-04_171214.csv',
-    'nusar-2021_action_both_9063-c07b_9063_user_id_2021-02-17_095115.csv',
-    'nusar-2021_action_both_9042-c09c_9042_user_id_2021-02-17_102611.csv',
-    'nusar-2021_action_both_9082-a31_9082_user_id_2021-02-16_132731.csv',
-    'nusar-2021_action_both_9053-c01d_9053_user_id_2021-02-08_141432.csv'
-]
-
+_VERB_IDX = {v: i for i, v in enumerate(verbs_sorted)}
+_PART_IDX = {p: i for i, p in enumerate(parts_sorted)}
+_LABEL_IDX = {l: i for i, l in enumerate(labels_sorted)}